@@ -1,15 +1,17 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 import base64
-import plotly.express as px
+import io
+import plotly.graph_objects as go
 from streamlit_option_menu import option_menu
-import streamlit.components.v1 as components
 import gspread
+from gspread.utils import a1_to_rowcol, rowcol_to_a1
 from google.oauth2.service_account import Credentials
-import time
-import random
+import os
+import re
 
 # Egypt timezone
 EGYPT_TZ = ZoneInfo("Africa/Cairo")
@@ -27,15 +29,19 @@ def get_credentials():
             st.error("Google Sheets credentials not found. Please check your secrets configuration.")
             return None
 
+# Open the worksheet once per process instead of re-authorizing on every rerun; failures raise
+# rather than return None so cache_resource does not pin a dead connection for the process lifetime
+@st.cache_resource(show_spinner=False)
+def get_sheet():
+    creds = get_credentials()
+    if not creds:
+        raise RuntimeError("Failed to initialize Google Sheets connection")
+    client = gspread.authorize(creds)
+    return client.open("AttendanceSheet").sheet1
+
 # Initialize Google Sheets client
 try:
-    CREDS = get_credentials()
-    if CREDS:
-        CLIENT = gspread.authorize(CREDS)
-        SHEET = CLIENT.open("AttendanceSheet").sheet1
-    else:
-        SHEET = None
-        st.error("Failed to initialize Google Sheets connection")
+    SHEET = get_sheet()
 except Exception as e:
     st.error(f"Error initializing Google Sheets: {str(e)}")
     SHEET = None
@@ -49,28 +55,76 @@ EXPECTED_COLUMNS = ['User', 'Date', 'CheckIn', 'CheckOut',
 TIME_COLUMNS = ['CheckIn', 'CheckOut', 'Break1Start', 'Break1End',
                 'Break2Start', 'Break2End', 'Break3Start', 'Break3End']
 
-# Function to convert to boolean safely
-def to_boolean(value):
-    if pd.isna(value) or value == '':
-        return True
-    if isinstance(value, bool):
-        return value
-    if isinstance(value, (int, float)):
-        return bool(value)
-    if isinstance(value, str):
-        lowered = value.lower()
-        if lowered in ['true', '1', 't', 'y', 'yes']:
-            return True
-        elif lowered in ['false', '0', 'f', 'n', 'no']:
-            return False
-        else:
-            return True
-    return True
+# (start, end) column pairs for the three breaks, so loops iterate these names instead of
+# formatting f'Break{i}Start' strings on every access
+BREAK_COLUMNS = tuple((f'Break{i}Start', f'Break{i}End') for i in (1, 2, 3))
 
-# Load data from Google Sheets
-try:
-    data = SHEET.get_all_records()
-    df = pd.DataFrame(data)
+# Single astype() mapping for the time columns
+STRING_SCHEMA = {col: "string[pyarrow]" for col in TIME_COLUMNS}
+
+# Data editor column descriptors, kept with the other column definitions instead of inline in the
+# admin branch (the script still re-executes top to bottom, so this is rebuilt on every rerun)
+DATA_EDITOR_COLUMNS = {
+    "User": st.column_config.TextColumn("User"),
+    "Date": st.column_config.DateColumn("Date"),
+    "CheckIn": st.column_config.TextColumn("Check In", help="Format: HH:MM AM/PM (e.g., 04:00 PM)"),
+    "CheckOut": st.column_config.TextColumn("Check Out", help="Format: HH:MM AM/PM"),
+    "Break1Start": st.column_config.TextColumn("Break 1 Start", help="Format: HH:MM AM/PM"),
+    "Break1End": st.column_config.TextColumn("Break 1 End", help="Format: HH:MM AM/PM"),
+    "Break2Start": st.column_config.TextColumn("Break 2 Start", help="Format: HH:MM AM/PM"),
+    "Break2End": st.column_config.TextColumn("Break 2 End", help="Format: HH:MM AM/PM"),
+    "Break3Start": st.column_config.TextColumn("Break 3 Start", help="Format: HH:MM AM/PM"),
+    "Break3End": st.column_config.TextColumn("Break 3 End", help="Format: HH:MM AM/PM"),
+    "TotalHours": st.column_config.NumberColumn("Total Hours", disabled=True),
+    "BreakDuration": st.column_config.NumberColumn("Break Duration", disabled=True),
+    "Active": st.column_config.CheckboxColumn("Active")
+}
+
+# Lowercased string forms accepted for the Active flag; anything else counts as active
+BOOLEAN_LOOKUP = {'true': True, '1': True, '1.0': True, 't': True, 'y': True, 'yes': True,
+                  'false': False, '0': False, '0.0': False, 'f': False, 'n': False, 'no': False}
+
+# Function to convert an Active column to booleans safely; blanks and unknown values count as active
+def to_boolean_series(series):
+    # Checkbox edits and typed Excel cells arrive as booleans already and skip the string round-trip
+    if pd.api.types.is_bool_dtype(series):
+        return series.astype("bool[pyarrow]").fillna(True)
+    return series.astype("string[pyarrow]").str.lower().map(BOOLEAN_LOOKUP).astype("bool[pyarrow]").fillna(True)
+
+# Vectorized calculate_times for many rows at once, on the same minutes-from-shift-start scale as
+# parse_minutes. Returns a TotalHours/BreakDuration frame to assign back in one shot.
+def calculate_times_frame(frame):
+    if frame.empty:
+        return pd.DataFrame({'TotalHours': 0.0, 'BreakDuration': 0.0}, index=frame.index)
+    # All eight time columns go through a single to_datetime call
+    stacked = pd.concat([frame[col] for col in TIME_COLUMNS], keys=TIME_COLUMNS)
+    times = pd.to_datetime(stacked, format="%I:%M %p", errors='coerce')
+    next_day = stacked.str.endswith("AM").fillna(False).astype("int64") * 24 * 60
+    # One (8, n) array in TIME_COLUMNS order: CheckIn, CheckOut, then each break's start/end pair
+    minutes = (times.dt.hour * 60 + times.dt.minute + next_day).to_numpy(dtype="float64", na_value=np.nan).reshape(len(TIME_COLUMNS), -1)
+    total_hours = np.nan_to_num((minutes[1] - minutes[0]) / 60)
+    break_duration = np.nansum(minutes[3::2] - minutes[2::2], axis=0) / 60
+    return pd.DataFrame({'TotalHours': total_hours, 'BreakDuration': break_duration}, index=frame.index)
+
+# Drive bumps modifiedTime on every edit, so it keys load_data to the sheet's actual revision;
+# the lookup itself is a Drive round-trip, so it is reused for a short window and cleared on our own saves
+@st.cache_data(ttl=30, show_spinner=False)
+def get_revision():
+    try:
+        return SHEET.spreadsheet.get_lastUpdateTime()
+    except Exception:
+        return None
+
+# Load data from Google Sheets (TTL is only the fallback when no revision is available; it must stay
+# constant, since the decorator is re-evaluated on every rerun and a changed TTL starts a fresh cache)
+@st.cache_data(ttl=300, max_entries=2, show_spinner=False)
+def load_data(revision):
+    # One values fetch; builds the frame from the raw rows instead of per-row dicts
+    values = SHEET.get_values()
+    if values:
+        df = pd.DataFrame(values[1:], columns=values[0])
+    else:
+        df = pd.DataFrame()
     
     for col in EXPECTED_COLUMNS:
         if col not in df.columns:
@@ -81,38 +135,181 @@ try:
             else:
                 df[col] = pd.NA
                 
-    df.replace('', pd.NA, inplace=True)
-    
-    for col in TIME_COLUMNS:
-        df[col] = df[col].astype("string").fillna(pd.NA)
+    # Blank cells only need masking in the text columns; to_numeric/to_datetime coerce the rest
+    text_columns = ['User'] + TIME_COLUMNS
+    df[text_columns] = df[text_columns].astype({'User': 'string[pyarrow]', **STRING_SCHEMA}).replace('', pd.NA)
         
-    df['TotalHours'] = pd.to_numeric(df['TotalHours'], errors='coerce').fillna(0.0).astype("float64")
-    df['BreakDuration'] = pd.to_numeric(df['BreakDuration'], errors='coerce').fillna(0.0).astype("float64")
-    df['Active'] = df['Active'].apply(to_boolean).astype("boolean")
+    # Totals are derived from the time strings once per revision; every write path recomputes them for
+    # the rows it touches, so reruns never re-parse the whole frame
+    df[['TotalHours', 'BreakDuration']] = calculate_times_frame(df)
+    df['Active'] = to_boolean_series(df['Active'])
     
-    if not df.empty and 'Date' in df.columns:
-        df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    # Date stays datetime64 for the life of the frame; strings only exist at the sheet/export edges
+    df['Date'] = pd.to_datetime(df['Date'], format='ISO8601', errors='coerce', cache=True)
     
+    return df, build_lookups(df)
+
+# Function to precompute row positions and widget options; cached alongside df in load_data
+def build_lookups(df):
+    if df.empty:
+        return {'user_rows': {}, 'session_rows': {}, 'date_rows': {}, 'active_users': [], 'users': [],
+                'dates': [], 'user_dates': {}}
+    # strftime only the distinct shift dates, then broadcast the labels back through the factorized codes
+    # (code -1 for a missing date picks the trailing NaN)
+    codes, uniques = pd.factorize(df['Date'].dt.normalize())
+    labels = np.append(uniques.strftime('%Y-%m-%d').to_numpy(dtype=object), np.nan)
+    date_keys = pd.Series(labels[codes], index=df.index)
+    # Group on category codes instead of rehashing every name; the categories are the sorted distinct users
+    users = df['User'].astype('category')
+    session_rows = users.groupby([users, date_keys], observed=True, sort=False).indices
+    date_rows = date_keys.groupby(date_keys, sort=False).indices
+    # Widget options come from the group keys above, so no extra strftime/unique pass per rerun
+    user_dates = {}
+    for user, day in sorted(session_rows):
+        user_dates.setdefault(user, []).append(day)
+    return {
+        # Row positions per user and per (user, date) session, so the portal never scans the frame
+        'user_rows': users.groupby(users, observed=True, sort=False).indices,
+        'session_rows': session_rows,
+        'date_rows': date_rows,
+        'active_users': sorted(users[df['Active'] == True].dropna().unique().tolist()),
+        'users': users.cat.categories.tolist(),
+        'dates': sorted(date_rows),
+        'user_dates': user_dates
+    }
+
+try:
+    # After our own write the session keeps its already-updated frame until the sheet revision moves on
+    revision = get_revision()
+    local_data = st.session_state.get('local_data')
+    if revision is not None and local_data and local_data[0] == revision:
+        df, LOOKUPS = local_data[1].copy(), local_data[2]
+    else:
+        df, LOOKUPS = load_data(revision)
+    DATA_LOADED = True
 except Exception as e:
     st.error(f"Error loading data from Google Sheets: {str(e)}")
-    dtypes = {col: "string" for col in TIME_COLUMNS}
-    dtypes.update({'User': 'string', 'Date': 'string', 'TotalHours': 'float64',
-                   'BreakDuration': 'float64', 'Active': 'boolean'})
+    # The empty fallback frame's row positions say nothing about the sheet, so writes are refused
+    DATA_LOADED = False
+    dtypes = dict(STRING_SCHEMA)
+    dtypes.update({'User': 'string[pyarrow]', 'Date': 'datetime64[ns]', 'TotalHours': 'float64',
+                   'BreakDuration': 'float64', 'Active': 'bool[pyarrow]'})
     df = pd.DataFrame(columns=EXPECTED_COLUMNS).astype(dtypes)
+    LOOKUPS = build_lookups(df)
+
+# Function to drop the cached sheet after a write and remember this session's updated frame against
+# the new revision, so the rerun can skip refetching the rows it just wrote. Drive's modifiedTime can
+# lag the write; while it still reads as the revision df was loaded at it cannot tell our frame apart
+# from a concurrent writer's, so nothing is remembered and the rerun refetches instead.
+def remember_data():
+    forget_data()
+    new_revision = get_revision()
+    if DATA_LOADED and new_revision is not None and new_revision != revision:
+        st.session_state.local_data = (new_revision, df.copy(), build_lookups(df))
+
+# Function to drop the cached sheet and this session's frame, so the next rerun refetches the sheet
+def forget_data():
+    load_data.clear()
+    get_revision.clear()
+    st.session_state.pop('local_data', None)
 
-# Function to save data to Google Sheets
+# Function to stop the run before any write unless df mirrors the sheet. The empty fallback frame
+# left by a failed load would write over real rows by position, and so would a frame whose rows
+# were sorted or deleted by hand since it was loaded; the cached revision can be 30 s old, so a
+# fresh one is compared with the revision df was loaded at
+def check_writable():
+    if not DATA_LOADED:
+        st.error("Sheet data is not loaded; changes were not saved. Reload the page and try again.")
+        st.stop()
+    get_revision.clear()
+    if get_revision() != revision:
+        forget_data()
+        st.warning("The sheet changed since this page was loaded, so nothing was saved. It has been "
+                   "reloaded; please repeat the action.")
+        st.stop()
+
+# Function to rewrite the whole sheet (used when rows are removed or replaced)
 def save_data():
-    global df
+    check_writable()
     try:
-        df_save = df.copy()
-        df_save['Date'] = df_save['Date'].apply(
-            lambda x: x.strftime('%Y-%m-%d') if pd.notna(x) and hasattr(x, 'strftime') else str(x) if pd.notna(x) else ''
-        )
+        # Pull each column out as a plain list and zip them into rows; no frame copy or object upcast
+        columns = []
+        for col in EXPECTED_COLUMNS:
+            if col == 'Date':
+                values = df['Date'].dt.strftime('%Y-%m-%d')
+            else:
+                values = df[col]
+            columns.append(values.to_numpy(dtype=object, na_value='').tolist())
+        # Header and rows go up in one append after the clear
+        data = [EXPECTED_COLUMNS] + [list(row) for row in zip(*columns)]
         SHEET.clear()
-        SHEET.append_row(EXPECTED_COLUMNS)
-        data = df_save.fillna('').values.tolist()
-        if data:
-            SHEET.append_rows(data)
+        SHEET.append_rows(data, value_input_option='RAW')
+        remember_data()
+    except Exception as e:
+        st.error(f"Error saving data to Google Sheets: {str(e)}")
+
+# Function to convert a row's values (in EXPECTED_COLUMNS order) into a list of sheet cell values
+def serialize_row(row):
+    values = []
+    for col, value in zip(EXPECTED_COLUMNS, row):
+        if pd.isna(value):
+            values.append('')
+        elif col == 'Date' and hasattr(value, 'strftime'):
+            values.append(value.strftime('%Y-%m-%d'))
+        elif hasattr(value, 'item'):
+            values.append(value.item())
+        else:
+            values.append(value)
+    return values
+
+# Function to write only the given df rows back to their sheet rows; with columns, only those cells
+def save_rows(row_indices, columns=None):
+    check_writable()
+    try:
+        updates = []
+        rows = df.loc[list(row_indices), EXPECTED_COLUMNS]
+        positions = df.index.get_indexer(rows.index)
+        # Plain tuples per row instead of materializing a Series for each one
+        for position, row in zip(positions, rows.itertuples(index=False, name=None)):
+            sheet_row = position + 2  # +1 for 1-based rows, +1 for header
+            values = serialize_row(row)
+            if columns is None:
+                updates.append({
+                    'range': f"A{sheet_row}:{rowcol_to_a1(sheet_row, len(EXPECTED_COLUMNS))}",
+                    'values': [values]
+                })
+            else:
+                for col in columns:
+                    col_number = EXPECTED_COLUMNS.index(col) + 1
+                    updates.append({'range': rowcol_to_a1(sheet_row, col_number), 'values': [[values[col_number - 1]]]})
+        if updates:
+            SHEET.batch_update(updates, value_input_option='RAW')
+        remember_data()
+    except Exception as e:
+        st.error(f"Error saving data to Google Sheets: {str(e)}")
+
+# Function to apply a portal event: one df write for the stamped cells and the recomputed totals,
+# then one batch_update for just those cells
+def apply_event(row_index, changes):
+    times = {col: df.at[row_index, col] for col in TIME_COLUMNS}
+    times.update(changes)
+    changes.update(zip(['TotalHours', 'BreakDuration'], calculate_times(times)))
+    df.loc[row_index, list(changes)] = list(changes.values())
+    save_rows([row_index], list(changes))
+
+# Function to append a newly added df row to the end of the sheet
+def append_row(row_index):
+    check_writable()
+    try:
+        response = SHEET.append_row(serialize_row(df.loc[row_index, EXPECTED_COLUMNS]), value_input_option='RAW')
+        # The API appends after the sheet's last row; if that is not where df put the row, the sheet has
+        # moved on since the load and df positions no longer line up, so refetch instead of keeping df
+        updated_range = response['updates']['updatedRange'].split('!')[-1]
+        sheet_row = a1_to_rowcol(updated_range.split(':')[0])[0]
+        if sheet_row == df.index.get_loc(row_index) + 2:
+            remember_data()
+        else:
+            forget_data()
     except Exception as e:
         st.error(f"Error saving data to Google Sheets: {str(e)}")
 
@@ -120,7 +317,7 @@ def save_data():
 def restore_from_excel(uploaded_file):
     global df
     try:
-        uploaded_df = pd.read_excel(uploaded_file, sheet_name='DataMatrix')
+        uploaded_df = pd.read_excel(uploaded_file, sheet_name='DataMatrix', engine='calamine')
         if not all(col in uploaded_df.columns for col in ['User', 'Date']):
             st.error("Uploaded Excel file must contain 'User' and 'Date' columns.")
             return False
@@ -134,14 +331,17 @@ def restore_from_excel(uploaded_file):
                 else:
                     uploaded_df[col] = pd.NA
                     
-        for col in TIME_COLUMNS:
-            uploaded_df[col] = uploaded_df[col].astype("string").fillna(pd.NA)
+        uploaded_df[TIME_COLUMNS] = uploaded_df[TIME_COLUMNS].astype(STRING_SCHEMA)
             
-        uploaded_df['User'] = uploaded_df['User'].astype("string")
-        uploaded_df['Date'] = pd.to_datetime(uploaded_df['Date'], errors='coerce')
-        uploaded_df['TotalHours'] = uploaded_df['TotalHours'].astype("float64")
-        uploaded_df['BreakDuration'] = uploaded_df['BreakDuration'].astype("float64")
-        uploaded_df['Active'] = uploaded_df['Active'].apply(to_boolean).astype("boolean")
+        uploaded_df['User'] = uploaded_df['User'].astype("string[pyarrow]")
+        # ISO fast path first (what the export writes); only leftover free-form cells go through inference
+        dates = pd.to_datetime(uploaded_df['Date'], format='ISO8601', errors='coerce', cache=True)
+        leftover = dates.isna() & uploaded_df['Date'].notna()
+        if leftover.any():
+            dates[leftover] = pd.to_datetime(uploaded_df.loc[leftover, 'Date'], errors='coerce')
+        uploaded_df['Date'] = dates
+        uploaded_df[['TotalHours', 'BreakDuration']] = calculate_times_frame(uploaded_df)
+        uploaded_df['Active'] = to_boolean_series(uploaded_df['Active'])
         
         df = pd.concat([df, uploaded_df]).drop_duplicates(subset=['User', 'Date', 'CheckIn'], keep='last').reset_index(drop=True)
         save_data()
@@ -151,358 +351,133 @@ def restore_from_excel(uploaded_file):
         st.error(f"Error restoring data: {str(e)}")
         return False
 
-# Function to calculate shift date
-def get_shift_date():
-    now = datetime.now(EGYPT_TZ)
+# Function to calculate shift date for the given Egypt-local time
+def get_shift_date(now):
     if now.hour < 4 or (now.hour == 4 and now.minute == 0):
         return (now - timedelta(days=1)).date()
     else:
         return now.date()
 
+# Function to enlarge df in place with a blank session row and return its index. The all-NA time
+# cells turn the string[pyarrow] time columns into object, so they are cast back afterwards.
+def add_session_row(user, shift_date):
+    row_index = len(df)
+    df.loc[row_index] = {'User': user, 'Date': pd.Timestamp(shift_date), 'Active': True,
+                         **dict.fromkeys(TIME_COLUMNS, pd.NA), 'TotalHours': 0.0, 'BreakDuration': 0.0}
+    df[TIME_COLUMNS] = df[TIME_COLUMNS].astype(STRING_SCHEMA)
+    return row_index
+
 # Function to format time as 12-hour string
 def format_time(dt):
     if isinstance(dt, datetime):
-        return dt.strftime("%I:%M %p").lstrip("0")
+        # Same text as strftime("%I:%M %p").lstrip("0"), built directly from the clock fields
+        return f"{dt.hour % 12 or 12}:{dt.minute:02d} {'AM' if dt.hour < 12 else 'PM'}"
     return dt
 
-# Function to parse time string with shift date for calculations
-def parse_time(time_str, shift_date):
+# 12-hour clock strings as written by format_time, e.g. "4:05 PM" or "04:05 PM"
+TIME_PATTERN = re.compile(r'\s*(\d{1,2}):(\d{1,2})\s+(AM|PM)', re.IGNORECASE)
+
+# Function to parse a time string into minutes from the start of its shift day; AM times belong
+# to the next calendar day. Both ends of an interval share the shift date and the Egypt zone, so
+# plain minute arithmetic gives the same durations as subtracting the aware datetimes.
+def parse_minutes(time_str):
     if pd.isna(time_str) or not isinstance(time_str, str):
         return None
-    try:
-        dt = datetime.strptime(f"{shift_date} {time_str}", "%Y-%m-%d %I:%M %p")
-        dt = dt.replace(tzinfo=EGYPT_TZ)
-        if dt.hour < 16 and time_str.endswith("AM"):
-            dt += timedelta(days=1)
-        return dt
-    except ValueError:
+    match = TIME_PATTERN.fullmatch(time_str)
+    if not match:
+        return None
+    hour, minute = int(match[1]), int(match[2])
+    if not 1 <= hour <= 12 or minute > 59:
         return None
+    minutes = (hour % 12 + (12 if match[3].upper() == 'PM' else 0)) * 60 + minute
+    if time_str.endswith("AM"):
+        minutes += 24 * 60
+    return minutes
 
 # Function to calculate total hours and break duration
-def calculate_times(row, shift_date):
-    check_in = parse_time(row['CheckIn'], shift_date) if pd.notna(row['CheckIn']) else None
-    check_out = parse_time(row['CheckOut'], shift_date) if pd.notna(row['CheckOut']) else None
-    if check_in and check_out:
-        total_hours = (check_out - check_in).total_seconds() / 3600
+def calculate_times(times):
+    # times maps each of TIME_COLUMNS to its string, so callers never build a full-row Series
+    minutes = {col: parse_minutes(times[col]) for col in TIME_COLUMNS}
+    if minutes['CheckIn'] is not None and minutes['CheckOut'] is not None:
+        total_hours = (minutes['CheckOut'] - minutes['CheckIn']) / 60
     else:
         total_hours = 0
     break_duration = 0
-    for i in range(1, 4):
-        start_col = f'Break{i}Start'
-        end_col = f'Break{i}End'
-        break_start = parse_time(row[start_col], shift_date) if pd.notna(row[start_col]) else None
-        break_end = parse_time(row[end_col], shift_date) if pd.notna(row[end_col]) else None
-        if break_start and break_end:
-            break_duration += (break_end - break_start).total_seconds() / 3600
+    for start_col, end_col in BREAK_COLUMNS:
+        break_start = minutes[start_col]
+        break_end = minutes[end_col]
+        if break_start is not None and break_end is not None:
+            break_duration += (break_end - break_start) / 60
     return total_hours, break_duration
 
-# ULTRA MODERN CSS WITH ADVANCED ANIMATIONS
-st.markdown("""
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Orbitron:wght@400;700;900&family=Rajdhani:wght@300;400;500;600;700&family=Exo+2:wght@100;200;300;400;500;600;700;800;900&display=swap');
-    
-    :root {
-        --primary-glow: #00f2ff;
-        --secondary-glow: #ff00ff;
-        --accent-glow: #00ff88;
-        --warning-glow: #ffaa00;
-        --deep-space: #0a0a1f;
-        --nebula-purple: #1a1a3e;
-        --cosmic-blue: #0f1f3f;
-        --stardust: rgba(255,255,255,0.1);
-        --text-neon: #ffffff;
-        --cyber-border: rgba(0, 242, 255, 0.3);
-    }
-    
-    * {
-        margin: 0;
-        padding: 0;
-        box-sizing: border-box;
-    }
-    
-    body, .stApp {
-        background: linear-gradient(135deg, var(--deep-space) 0%, var(--nebula-purple) 50%, var(--cosmic-blue) 100%);
-        background-size: 400% 400%;
-        animation: cosmicShift 20s ease infinite;
-        color: var(--text-neon);
-        font-family: 'Rajdhani', sans-serif;
-        overflow-x: hidden;
-        min-height: 100vh;
-    }
-    
-    @keyframes cosmicShift {
-        0% { background-position: 0% 50%; }
-        50% { background-position: 100% 50%; }
-        100% { background-position: 0% 50%; }
-    }
-    
-    /* Animated Starfield Background */
-    body::before {
-        content: '';
-        position: fixed;
-        top: 0;
-        left: 0;
-        width: 100%;
-        height: 100%;
-        background: 
-            radial-gradient(2px 2px at 20px 30px, #eee, transparent),
-            radial-gradient(2px 2px at 40px 70px, #fff, transparent),
-            radial-gradient(1px 1px at 90px 40px, #fff, transparent),
-            radial-gradient(1px 1px at 130px 80px, #fff, transparent),
-            radial-gradient(2px 2px at 160px 30px, #eee, transparent);
-        background-size: 200px 200px;
-        animation: starsMove 100s linear infinite;
-        z-index: -1;
-        opacity: 0.3;
-    }
-    
-    @keyframes starsMove {
-        from { transform: translateY(0px); }
-        to { transform: translateY(-200px); }
-    }
-    
-    /* Cyber Grid Overlay */
-    body::after {
-        content: '';
-        position: fixed;
-        top: 0;
-        left: 0;
-        width: 100%;
-        height: 100%;
-        background: 
-            linear-gradient(90deg, transparent 95%, rgba(0, 242, 255, 0.03) 95%),
-            linear-gradient(0deg, transparent 95%, rgba(0, 242, 255, 0.03) 95%);
-        background-size: 50px 50px;
-        z-index: -1;
-        pointer-events: none;
-    }
-    
-    /* Main Container Enhancements */
-    .main .block-container {
-        padding-top: 2rem;
-        max-width: 1200px;
-    }
-    
-    /* Cyber Header */
-    .cyber-header {
-        font-family: 'Orbitron', monospace;
-        font-weight: 900;
-        font-size: 3.5rem;
-        text-align: center;
-        margin-bottom: 2rem;
-        background: linear-gradient(45deg, var(--primary-glow), var(--secondary-glow), var(--accent-glow));
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        background-clip: text;
-        text-shadow: 
-            0 0 30px rgba(0, 242, 255, 0.5),
-            0 0 60px rgba(255, 0, 255, 0.3),
-            0 0 90px rgba(0, 255, 136, 0.2);
-        animation: textGlow 3s ease-in-out infinite alternate;
-        position: relative;
-    }
-    
-    @keyframes textGlow {
-        from {
-            text-shadow: 
-                0 0 20px rgba(0, 242, 255, 0.5),
-                0 0 40px rgba(255, 0, 255, 0.3),
-                0 0 60px rgba(0, 255, 136, 0.2);
-        }
-        to {
-            text-shadow: 
-                0 0 30px rgba(0, 242, 255, 0.8),
-                0 0 60px rgba(255, 0, 255, 0.5),
-                0 0 90px rgba(0, 255, 136, 0.4);
-        }
-    }
-    
-    /* Cyber Card */
-    .cyber-card {
-        background: rgba(10, 15, 35, 0.7);
-        backdrop-filter: blur(20px);
-        border: 1px solid var(--cyber-border);
-        border-radius: 15px;
-        padding: 2rem;
-        margin: 1.5rem 0;
-        position: relative;
-        overflow: hidden;
-        box-shadow: 
-            0 8px 32px rgba(0, 0, 0, 0.3),
-            inset 0 1px 0 rgba(255, 255, 255, 0.1);
-        transition: all 0.4s cubic-bezier(0.175, 0.885, 0.32, 1.275);
-        animation: cardAppear 0.6s ease-out;
-    }
-    
-    @keyframes cardAppear {
-        from {
-            opacity: 0;
-            transform: translateY(30px) scale(0.95);
-        }
-        to {
-            opacity: 1;
-            transform: translateY(0) scale(1);
-        }
-    }
-    
-    .cyber-card::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: -100%;
-        width: 100%;
-        height: 100%;
-        background: linear-gradient(90deg, transparent, rgba(0, 242, 255, 0.1), transparent);
-        transition: left 0.6s ease;
-    }
-    
-    .cyber-card:hover::before {
-        left: 100%;
-    }
-    
-    .cyber-card:hover {
-        transform: translateY(-5px) scale(1.02);
-        box-shadow: 
-            0 15px 40px rgba(0, 242, 255, 0.3),
-            0 0 30px rgba(255, 0, 255, 0.2),
-            inset 0 1px 0 rgba(255, 255, 255, 0.2);
-        border-color: rgba(0, 242, 255, 0.6);
-    }
-    
-    /* Cyber Button */
-    .stButton > button {
-        background: linear-gradient(135deg, rgba(0, 242, 255, 0.1), rgba(255, 0, 255, 0.1)) !important;
-        border: 1px solid var(--cyber-border) !important;
-        color: var(--text-neon) !important;
-        padding: 1rem 2rem !important;
-        font-family: 'Exo 2', sans-serif !important;
-        font-weight: 600 !important;
-        font-size: 1.1rem !important;
-        border-radius: 10px !important;
-        transition: all 0.3s ease !important;
-        position: relative !important;
-        overflow: hidden !important;
-        text-transform: uppercase !important;
-        letter-spacing: 1px !important;
-        backdrop-filter: blur(10px) !important;
-    }
-    
-    .stButton > button::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: -100%;
-        width: 100%;
-        height: 100%;
-        background: linear-gradient(90deg, transparent, rgba(0, 242, 255, 0.4), transparent);
-        transition: left 0.5s ease;
-    }
-    
-    .stButton > button:hover::before {
-        left: 100%;
-    }
-    
-    .stButton > button:hover {
-        background: linear-gradient(135deg, rgba(0, 242, 255, 0.2), rgba(255, 0, 255, 0.2)) !important;
-        box-shadow: 
-            0 0 20px rgba(0, 242, 255, 0.4),
-            0 0 40px rgba(255, 0, 255, 0.2) !important;
-        transform: translateY(-2px) !important;
-        border-color: var(--primary-glow) !important;
-    }
-    
-    /* Status Indicators */
-    .status-active {
-        color: var(--accent-glow);
-        text-shadow: 0 0 10px currentColor;
-        animation: pulse 2s infinite;
-    }
-    
-    .status-pending {
-        color: var(--warning-glow);
-        text-shadow: 0 0 10px currentColor;
-        animation: blink 1.5s infinite;
-    }
-    
-    @keyframes pulse {
-        0%, 100% { opacity: 1; }
-        50% { opacity: 0.7; }
-    }
-    
-    @keyframes blink {
-        0%, 50% { opacity: 1; }
-        51%, 100% { opacity: 0.3; }
-    }
-    
-    /* Navigation Enhancement */
-    .css-1lcbmhc {
-        background: rgba(10, 15, 35, 0.9) !important;
-        backdrop-filter: blur(20px);
-        border-right: 1px solid var(--cyber-border) !important;
-    }
-    
-    /* Input Fields */
-    .stTextInput > div > div > input, 
-    .stSelectbox > div > select {
-        background: rgba(255, 255, 255, 0.05) !important;
-        border: 1px solid var(--cyber-border) !important;
-        color: var(--text-neon) !important;
-        border-radius: 8px !important;
-        padding: 12px !important;
-        font-family: 'Rajdhani', sans-serif !important;
-        transition: all 0.3s ease !important;
-    }
-    
-    .stTextInput > div > div > input:focus, 
-    .stSelectbox > div > select:focus {
-        border-color: var(--primary-glow) !important;
-        box-shadow: 0 0 15px rgba(0, 242, 255, 0.3) !important;
-        background: rgba(255, 255, 255, 0.1) !important;
-    }
-    
-    /* Dataframe Styling */
-    .dataframe {
-        background: rgba(255, 255, 255, 0.05) !important;
-        border: 1px solid var(--cyber-border) !important;
-        border-radius: 10px !important;
-        overflow: hidden !important;
-    }
-    
-    /* Progress Bars */
-    .stProgress > div > div > div {
-        background: linear-gradient(90deg, var(--primary-glow), var(--accent-glow)) !important;
-    }
-    
-    /* Custom Scrollbar */
-    ::-webkit-scrollbar {
-        width: 8px;
-    }
-    
-    ::-webkit-scrollbar-track {
-        background: rgba(255, 255, 255, 0.05);
-        border-radius: 4px;
-    }
-    
-    ::-webkit-scrollbar-thumb {
-        background: linear-gradient(180deg, var(--primary-glow), var(--secondary-glow));
-        border-radius: 4px;
-    }
-    
-    ::-webkit-scrollbar-thumb:hover {
-        background: linear-gradient(180deg, var(--accent-glow), var(--primary-glow));
-    }
-    
-    /* Floating Elements */
-    .floating {
-        animation: floating 3s ease-in-out infinite;
-    }
-    
-    @keyframes floating {
-        0%, 100% { transform: translateY(0px); }
-        50% { transform: translateY(-10px); }
-    }
-    </style>
-""", unsafe_allow_html=True)
+# Function to list the clock actions a session row allows next, as (label, key, column, message);
+# the same guards the portal used to check per button on every rerun
+def session_actions(row):
+    # One missing-value check per time column; the guards below only read these plain bools
+    filled = {col: pd.notna(row[col]) for col in TIME_COLUMNS}
+    actions = []
+    if not filled['CheckIn']:
+        actions.append(("🟢 CHECK IN", "check_in", 'CheckIn', "Checked in"))
+    for i, (start_col, end_col) in enumerate(BREAK_COLUMNS, 1):
+        if not filled[start_col] and filled['CheckIn'] and (i == 1 or filled[BREAK_COLUMNS[i - 2][1]]):
+            actions.append((f"☕ BREAK {i} START", f"break_{i}_start", start_col, f"Break {i} started"))
+        if filled[start_col] and not filled[end_col]:
+            actions.append((f"🔙 BREAK {i} END", f"break_{i}_end", end_col, f"Break {i} ended"))
+    breaks_closed = all(filled[end_col] for start_col, end_col in BREAK_COLUMNS if filled[start_col])
+    if filled['CheckIn'] and not filled['CheckOut'] and breaks_closed:
+        actions.append(("🔴 CHECK OUT", "check_out", 'CheckOut', "Checked out"))
+    return actions
+
+# Per-user analytics, cached on the contents of the three columns passed in; one groupby pass
+# produces both aggregates, and only the small per-user result is put in name order
+@st.cache_data(show_spinner=False)
+def per_user_totals(frame):
+    return (frame.groupby('User', sort=False, observed=True)
+            .agg(TotalHours=('TotalHours', 'sum'), BreakDuration=('BreakDuration', 'mean'))
+            .reset_index().sort_values('User', ignore_index=True))
+
+# Analytics figures, cached on the frames they plot so reruns skip trace and layout validation
+CHART_THEME = {'plot_bgcolor': 'rgba(0,0,0,0)', 'paper_bgcolor': 'rgba(0,0,0,0)', 'font_color': '#ffffff'}
+
+@st.cache_data(show_spinner=False)
+def total_hours_figure(frame):
+    fig = go.Figure(go.Bar(x=frame['User'], y=frame['TotalHours'],
+                           marker={'color': frame['TotalHours'], 'colorscale': 'viridis',
+                                   'showscale': True, 'colorbar': {'title': 'TotalHours'}}))
+    return fig.update_layout(title='TOTAL HOURS PER USER', xaxis_title='User', yaxis_title='TotalHours',
+                             title_font_size=20, title_x=0.5, **CHART_THEME)
+
+@st.cache_data(show_spinner=False)
+def hours_trend_figure(frame, user):
+    fig = go.Figure(go.Scattergl(x=frame['Date'], y=frame['TotalHours'], mode='lines+markers', line={'color': '#00ff88'}))
+    return fig.update_layout(title=f'HOURS TREND: {user}', xaxis_title='Date', yaxis_title='TotalHours', **CHART_THEME)
+
+@st.cache_data(show_spinner=False)
+def average_break_figure(frame):
+    fig = go.Figure(go.Pie(labels=frame['User'], values=frame['BreakDuration']))
+    return fig.update_layout(title='AVERAGE BREAK DURATION', **CHART_THEME)
+
+# Excel export built in memory and cached on the frame contents, so reruns reuse the encoded file
+@st.cache_data(max_entries=1, show_spinner=False)
+def get_excel_download_link(frame):
+    df_download = frame.copy()
+    df_download['Date'] = df_download['Date'].dt.strftime('%Y-%m-%d').fillna('')
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+        df_download.to_excel(writer, index=False, sheet_name='DataMatrix')
+    b64 = base64.b64encode(buffer.getvalue()).decode()
+    return f'<a href="data:application/octet-stream;base64,{b64}" download="attendance.xlsx" style="display: inline-block; padding: 0.5rem 1rem; background: linear-gradient(135deg, rgba(0, 242, 255, 0.2), rgba(255, 0, 255, 0.2)); border: 1px solid var(--cyber-border); border-radius: 5px; color: var(--text-neon); text-decoration: none; font-family: Exo 2, sans-serif; font-weight: 600;">📥 DOWNLOAD DATA MATRIX</a>'
+
+# ULTRA MODERN CSS WITH ADVANCED ANIMATIONS (kept in static/app.css, read once per process)
+@st.cache_resource(show_spinner=False)
+def load_css():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'app.css'), encoding='utf-8') as f:
+        return f"<style>\n{f.read()}</style>"
+
+st.markdown(load_css(), unsafe_allow_html=True)
+
+# Sample the clock once per rerun so every timestamp and the shift date agree
+NOW = datetime.now(EGYPT_TZ)
 
 # Initialize session state
 if 'selected_user' not in st.session_state:
@@ -559,7 +534,7 @@ if selected == "🚀 USER PORTAL":
     
     with st.container():
         st.markdown("<div class='cyber-card'>", unsafe_allow_html=True)
-        active_users = sorted(df[df['Active'] == True]['User'].unique().tolist())
+        active_users = LOOKUPS['active_users']
         
         with st.form(key="user_selection_form"):
             if not active_users:
@@ -583,92 +558,44 @@ if selected == "🚀 USER PORTAL":
 
     if st.session_state.selected_user:
         user_name = st.session_state.selected_user
-        user_records = df[df['User'] == user_name]
-        user_active = user_records['Active'].any() if not user_records.empty else True
+        # Only the user's Active flags are read; the active user list itself is cached in LOOKUPS
+        user_flags = df['Active'].iloc[LOOKUPS['user_rows'].get(user_name, [])]
+        user_active = user_flags.any() if not user_flags.empty else True
         
         if not user_active:
             st.error("⚠️ ACCESS DENIED: User account has been deactivated.")
             st.session_state.selected_user = None
         else:
-            shift_date = get_shift_date()
-            user_rows = df[(df['User'] == user_name) & (df['Date'] == str(shift_date))]
+            shift_date = get_shift_date(NOW)
+            user_rows = df.iloc[LOOKUPS['session_rows'].get((user_name, str(shift_date)), [])]
             
             # Start New Session
             col1, col2, col3 = st.columns([2, 1, 2])
             with col2:
                 if st.button("🎯 INITIATE NEW SESSION", use_container_width=True, key="start_session"):
-                    new_row = {
-                        'User': user_name, 'Date': str(shift_date), 'Active': True,
-                        'CheckIn': pd.NA, 'CheckOut': pd.NA, 'TotalHours': 0.0, 'BreakDuration': 0.0
-                    }
-                    for i in range(1, 4):
-                        new_row[f'Break{i}Start'] = pd.NA
-                        new_row[f'Break{i}End'] = pd.NA
-                    
-                    new_row_df = pd.DataFrame([new_row]).astype({
-                        'User': 'string', 'Date': 'string', 'CheckIn': 'string', 'CheckOut': 'string',
-                        'Break1Start': 'string', 'Break1End': 'string', 'Break2Start': 'string', 
-                        'Break2End': 'string', 'Break3Start': 'string', 'Break3End': 'string',
-                        'TotalHours': 'float64', 'BreakDuration': 'float64', 'Active': 'boolean'
-                    })
-                    df = pd.concat([df, new_row_df], ignore_index=True)
-                    save_data()
+                    append_row(add_session_row(user_name, shift_date))
                     st.session_state.last_action = "New session initialized"
                     st.success("🚀 SESSION INITIALIZED")
                     st.rerun()
 
             if not user_rows.empty:
                 row_index = user_rows.index[-1]
+                row = df.loc[row_index].to_dict()  # single snapshot for all the guard checks below; plain dict lookups
                 
                 # Action Buttons Grid
                 st.markdown("<div class='cyber-card'>", unsafe_allow_html=True)
                 st.markdown("<h3 style='color: var(--primary-glow); text-align: center;'>MISSION CONTROL</h3>", unsafe_allow_html=True)
                 
-                col1, col2, col3 = st.columns(3)
-                
-                with col1:
-                    if st.button("🟢 CHECK IN", use_container_width=True, key=f"check_in_{row_index}") and pd.isna(df.at[row_index, 'CheckIn']):
-                        df.at[row_index, 'CheckIn'] = format_time(datetime.now(EGYPT_TZ))
-                        total_hours, break_duration = calculate_times(df.loc[row_index], shift_date)
-                        df.at[row_index, 'TotalHours'] = total_hours
-                        df.at[row_index, 'BreakDuration'] = break_duration
-                        save_data()
-                        st.session_state.last_action = "Checked in"
-                        st.rerun()
-                
-                with col2:
-                    for i in range(1, 4):
-                        if st.button(f"☕ BREAK {i} START", use_container_width=True, key=f"break_{i}_start_{row_index}") and pd.isna(df.at[row_index, f'Break{i}Start']) and pd.notna(df.at[row_index, 'CheckIn']):
-                            if i == 1 or (pd.notna(df.at[row_index, f'Break{i-1}End'])):
-                                df.at[row_index, f'Break{i}Start'] = format_time(datetime.now(EGYPT_TZ))
-                                total_hours, break_duration = calculate_times(df.loc[row_index], shift_date)
-                                df.at[row_index, 'TotalHours'] = total_hours
-                                df.at[row_index, 'BreakDuration'] = break_duration
-                                save_data()
-                                st.session_state.last_action = f"Break {i} started"
+                # Only the transitions the session allows right now are rendered and dispatched
+                actions = session_actions(row)
+                if actions:
+                    for col, (label, key, column, message) in zip(st.columns(len(actions)), actions):
+                        with col:
+                            if st.button(label, use_container_width=True, key=f"{key}_{row_index}"):
+                                apply_event(row_index, {column: format_time(NOW)})
+                                st.session_state.last_action = message
                                 st.rerun()
                 
-                with col3:
-                    for i in range(1, 4):
-                        if st.button(f"🔙 BREAK {i} END", use_container_width=True, key=f"break_{i}_end_{row_index}") and pd.notna(df.at[row_index, f'Break{i}Start']) and pd.isna(df.at[row_index, f'Break{i}End']):
-                            df.at[row_index, f'Break{i}End'] = format_time(datetime.now(EGYPT_TZ))
-                            total_hours, break_duration = calculate_times(df.loc[row_index], shift_date)
-                            df.at[row_index, 'TotalHours'] = total_hours
-                            df.at[row_index, 'BreakDuration'] = break_duration
-                            save_data()
-                            st.session_state.last_action = f"Break {i} ended"
-                            st.rerun()
-                    
-                    if st.button("🔴 CHECK OUT", use_container_width=True, key=f"check_out_{row_index}") and pd.notna(df.at[row_index, 'CheckIn']) and pd.isna(df.at[row_index, 'CheckOut']):
-                        if all(pd.notna(df.at[row_index, f'Break{i}End']) for i in range(1, 4) if pd.notna(df.at[row_index, f'Break{i}Start'])):
-                            df.at[row_index, 'CheckOut'] = format_time(datetime.now(EGYPT_TZ))
-                            total_hours, break_duration = calculate_times(df.loc[row_index], shift_date)
-                            df.at[row_index, 'TotalHours'] = total_hours
-                            df.at[row_index, 'BreakDuration'] = break_duration
-                            save_data()
-                            st.session_state.last_action = "Checked out"
-                            st.rerun()
-                
                 st.markdown("</div>", unsafe_allow_html=True)
                 
                 # Current Session Status
@@ -676,15 +603,15 @@ if selected == "🚀 USER PORTAL":
                 st.markdown("<h3 style='color: var(--accent-glow);'>LIVE SESSION STATUS</h3>", unsafe_allow_html=True)
                 
                 status_data = {
-                    "Check In": df.at[row_index, 'CheckIn'],
-                    "Check Out": df.at[row_index, 'CheckOut'],
-                    "Total Hours": f"{df.at[row_index, 'TotalHours']:.2f} hours",
-                    "Break Duration": f"{df.at[row_index, 'BreakDuration']:.2f} hours"
+                    "Check In": row['CheckIn'],
+                    "Check Out": row['CheckOut'],
+                    "Total Hours": f"{row['TotalHours']:.2f} hours",
+                    "Break Duration": f"{row['BreakDuration']:.2f} hours"
                 }
                 
-                for i in range(1, 4):
-                    status_data[f"Break {i} Start"] = df.at[row_index, f'Break{i}Start']
-                    status_data[f"Break {i} End"] = df.at[row_index, f'Break{i}End']
+                for i, (start_col, end_col) in enumerate(BREAK_COLUMNS, 1):
+                    status_data[f"Break {i} Start"] = row[start_col]
+                    status_data[f"Break {i} End"] = row[end_col]
                 
                 cols = st.columns(3)
                 col_idx = 0
@@ -727,64 +654,45 @@ elif selected == "⚙️ COMMAND CENTER":
         # Filter options
         col1, col2 = st.columns(2)
         with col1:
-            filter_user = st.selectbox("FILTER BY USER", options=['All'] + sorted(df['User'].unique().tolist()), key='filter_user')
+            filter_user = st.selectbox("FILTER BY USER", options=['All'] + LOOKUPS['users'], key='filter_user')
         with col2:
-            filter_date = st.selectbox("FILTER BY DATE", options=['All'] + sorted(df['Date'].dt.strftime('%Y-%m-%d').unique().tolist()), key='filter_date')
+            filter_date = st.selectbox("FILTER BY DATE", options=['All'] + LOOKUPS['dates'], key='filter_date')
         
-        filtered_df = df
-        if filter_user != 'All':
-            filtered_df = filtered_df[filtered_df['User'] == filter_user]
-        if filter_date != 'All':
-            filtered_df = filtered_df[filtered_df['Date'].dt.strftime('%Y-%m-%d') == filter_date]
-        
-        # Ensure time columns are strings before editing
-        for col in TIME_COLUMNS:
-            filtered_df[col] = filtered_df[col].astype("string").fillna(pd.NA)
-        
-        # Calculate totals before editing
-        for idx, row in filtered_df.iterrows():
-            total_hours, break_duration = calculate_times(row, row['Date'].date())
-            filtered_df.at[idx, 'TotalHours'] = total_hours
-            filtered_df.at[idx, 'BreakDuration'] = break_duration
+        # Filters resolve to precomputed row positions instead of masking the whole frame
+        if filter_user != 'All' and filter_date != 'All':
+            filtered_df = df.iloc[LOOKUPS['session_rows'].get((filter_user, filter_date), [])]
+        elif filter_user != 'All':
+            filtered_df = df.iloc[LOOKUPS['user_rows'].get(filter_user, [])]
+        elif filter_date != 'All':
+            filtered_df = df.iloc[LOOKUPS['date_rows'].get(filter_date, [])]
+        else:
+            filtered_df = df
         
         # Editable DataFrame
         edited_df = st.data_editor(
             filtered_df,
-            column_config={
-                "User": st.column_config.TextColumn("User"),
-                "Date": st.column_config.DateColumn("Date"),
-                "CheckIn": st.column_config.TextColumn("Check In", help="Format: HH:MM AM/PM (e.g., 04:00 PM)"),
-                "CheckOut": st.column_config.TextColumn("Check Out", help="Format: HH:MM AM/PM"),
-                "Break1Start": st.column_config.TextColumn("Break 1 Start", help="Format: HH:MM AM/PM"),
-                "Break1End": st.column_config.TextColumn("Break 1 End", help="Format: HH:MM AM/PM"),
-                "Break2Start": st.column_config.TextColumn("Break 2 Start", help="Format: HH:MM AM/PM"),
-                "Break2End": st.column_config.TextColumn("Break 2 End", help="Format: HH:MM AM/PM"),
-                "Break3Start": st.column_config.TextColumn("Break 3 Start", help="Format: HH:MM AM/PM"),
-                "Break3End": st.column_config.TextColumn("Break 3 End", help="Format: HH:MM AM/PM"),
-                "TotalHours": st.column_config.NumberColumn("Total Hours", disabled=True),
-                "BreakDuration": st.column_config.NumberColumn("Break Duration", disabled=True),
-                "Active": st.column_config.CheckboxColumn("Active")
-            },
+            column_config=DATA_EDITOR_COLUMNS,
             use_container_width=True,
             height=400
         )
         
         if st.button("💾 SAVE DATA MATRIX", use_container_width=True):
-            for idx, row in edited_df.iterrows():
-                total_hours, break_duration = calculate_times(row, row['Date'].date())
-                edited_df.at[idx, 'TotalHours'] = total_hours
-                edited_df.at[idx, 'BreakDuration'] = break_duration
-            # Ensure time columns remain strings
-            for col in TIME_COLUMNS:
-                edited_df[col] = edited_df[col].astype("string").fillna(pd.NA)
-            # Ensure Active is boolean
-            edited_df['Active'] = edited_df['Active'].apply(to_boolean).astype("boolean")
-            df.update(edited_df)
-            df.loc[edited_df.index] = edited_df
-            save_data()
-            st.success("✅ DATA MATRIX UPDATED SUCCESSFULLY!")
-            st.session_state.last_action = "Data matrix updated"
-            st.rerun()
+            # Only rows the admin actually touched are recomputed and written back
+            editable = edited_df.columns.difference(['TotalHours', 'BreakDuration'])
+            before, after = filtered_df[editable], edited_df[editable]
+            unchanged = after.eq(before).fillna(False) | (after.isna() & before.isna())
+            edited_df = edited_df[~unchanged.all(axis=1)]
+            if edited_df.empty:
+                st.info("No changes to save.")
+            else:
+                edited_df[['TotalHours', 'BreakDuration']] = calculate_times_frame(edited_df)
+                # Ensure Active is boolean
+                edited_df['Active'] = to_boolean_series(edited_df['Active'])
+                df.loc[edited_df.index] = edited_df
+                save_rows(edited_df.index)
+                st.success("✅ DATA MATRIX UPDATED SUCCESSFULLY!")
+                st.session_state.last_action = "Data matrix updated"
+                st.rerun()
         st.markdown("</div>", unsafe_allow_html=True)
         
         # Analytics Section
@@ -792,47 +700,24 @@ elif selected == "⚙️ COMMAND CENTER":
         st.markdown("<h3 style='color: var(--primary-glow);'>📈 QUANTUM ANALYTICS</h3>", unsafe_allow_html=True)
         
         # Total Hours per User Bar Chart
-        total_hours_df = df.groupby('User')['TotalHours'].sum().reset_index()
-        if not total_hours_df.empty:
-            fig_bar = px.bar(total_hours_df, x='User', y='TotalHours', title='TOTAL HOURS PER USER',
-                             color='TotalHours', color_continuous_scale='viridis')
-            fig_bar.update_layout(
-                plot_bgcolor='rgba(0,0,0,0)', 
-                paper_bgcolor='rgba(0,0,0,0)',
-                font_color='#ffffff',
-                title_font_size=20,
-                title_x=0.5
-            )
-            st.plotly_chart(fig_bar, use_container_width=True)
+        user_totals = per_user_totals(df[['User', 'TotalHours', 'BreakDuration']])
+        if not user_totals.empty:
+            st.plotly_chart(total_hours_figure(user_totals), use_container_width=True)
         
         col1, col2 = st.columns(2)
         
         with col1:
             # User Trend
-            analytics_user = st.selectbox("SELECT USER FOR TREND ANALYSIS", options=sorted(df['User'].unique().tolist()), key='analytics_user')
+            analytics_user = st.selectbox("SELECT USER FOR TREND ANALYSIS", options=LOOKUPS['users'], key='analytics_user')
             if analytics_user:
-                user_data = df[df['User'] == analytics_user].sort_values('Date')
+                user_data = df[['Date', 'TotalHours']].iloc[LOOKUPS['user_rows'].get(analytics_user, [])].sort_values('Date')
                 if not user_data.empty:
-                    fig_line = px.line(user_data, x='Date', y='TotalHours', title=f'HOURS TREND: {analytics_user}',
-                                       markers=True, color_discrete_sequence=['#00ff88'])
-                    fig_line.update_layout(
-                        plot_bgcolor='rgba(0,0,0,0)', 
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        font_color='#ffffff'
-                    )
-                    st.plotly_chart(fig_line, use_container_width=True)
+                    st.plotly_chart(hours_trend_figure(user_data, analytics_user), use_container_width=True)
         
         with col2:
             # Break Duration Pie Chart
-            avg_break = df.groupby('User')['BreakDuration'].mean().reset_index()
-            if not avg_break.empty:
-                fig_pie = px.pie(avg_break, values='BreakDuration', names='User', title='AVERAGE BREAK DURATION')
-                fig_pie.update_layout(
-                    plot_bgcolor='rgba(0,0,0,0)', 
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font_color='#ffffff'
-                )
-                st.plotly_chart(fig_pie, use_container_width=True)
+            if not user_totals.empty:
+                st.plotly_chart(average_break_figure(user_totals), use_container_width=True)
         
         st.markdown("</div>", unsafe_allow_html=True)
         
@@ -846,31 +731,10 @@ elif selected == "⚙️ COMMAND CENTER":
             st.markdown("<h4 style='color: var(--accent-glow);'>ADD NEW USER</h4>", unsafe_allow_html=True)
             new_user = st.text_input("Enter new user name", placeholder="New User Identity...")
             if st.button("🔧 ADD USER", use_container_width=True) and new_user:
-                user_records = df[df['User'] == new_user]
-                if user_records.empty or not user_records['Active'].any():
-                    new_row = {
-                        'User': new_user,
-                        'Date': str(get_shift_date()),
-                        'Active': True,
-                        'CheckIn': pd.NA,
-                        'CheckOut': pd.NA,
-                        'Break1Start': pd.NA,
-                        'Break1End': pd.NA,
-                        'Break2Start': pd.NA,
-                        'Break2End': pd.NA,
-                        'Break3Start': pd.NA,
-                        'Break3End': pd.NA,
-                        'TotalHours': 0.0,
-                        'BreakDuration': 0.0
-                    }
-                    new_row_df = pd.DataFrame([new_row]).astype({
-                        'User': 'string', 'Date': 'string', 'CheckIn': 'string', 'CheckOut': 'string',
-                        'Break1Start': 'string', 'Break1End': 'string', 'Break2Start': 'string', 
-                        'Break2End': 'string', 'Break3Start': 'string', 'Break3End': 'string',
-                        'TotalHours': 'float64', 'BreakDuration': 'float64', 'Active': 'boolean'
-                    })
-                    df = pd.concat([df, new_row_df], ignore_index=True)
-                    save_data()
+                user_flags = df['Active'].iloc[LOOKUPS['user_rows'].get(new_user, [])]
+                if user_flags.empty or not user_flags.any():
+                    # Enlarge in place like the portal's new-session path instead of concatenating a one-row frame
+                    append_row(add_session_row(new_user, get_shift_date(NOW)))
                     st.success(f"✅ USER {new_user} AUTHORIZED")
                     st.session_state.last_action = f"User {new_user} added"
                     st.rerun()
@@ -879,13 +743,13 @@ elif selected == "⚙️ COMMAND CENTER":
         
         with tab2:
             st.markdown("<h4 style='color: var(--accent-glow);'>EDIT USER SESSION</h4>", unsafe_allow_html=True)
-            edit_user = st.selectbox("SELECT USER", options=['None'] + sorted(df['User'].unique().tolist()), key='edit_user')
+            edit_user = st.selectbox("SELECT USER", options=['None'] + LOOKUPS['users'], key='edit_user')
             if edit_user != 'None':
-                user_sessions = df[df['User'] == edit_user]
-                if not user_sessions.empty:
-                    session_dates = sorted(user_sessions['Date'].dt.strftime('%Y-%m-%d').unique().tolist())
+                session_dates = LOOKUPS['user_dates'].get(edit_user, [])
+                if session_dates:
                     edit_date = st.selectbox("SELECT SESSION DATE", options=session_dates, key='edit_date')
-                    session_row = user_sessions[user_sessions['Date'].dt.strftime('%Y-%m-%d') == edit_date].iloc[-1]
+                    # The (user, date) row positions are precomputed, so no second strftime pass or mask
+                    session_row = df.iloc[LOOKUPS['session_rows'][(edit_user, edit_date)][-1]]
                     session_index = session_row.name
                     
                     with st.form(key=f"edit_session_form_{session_index}"):
@@ -909,51 +773,38 @@ elif selected == "⚙️ COMMAND CENTER":
                         if st.form_submit_button("💾 SAVE SESSION", use_container_width=True):
                             # Validate time format
                             time_fields = [check_in, check_out, break1_start, break1_end, break2_start, break2_end, break3_start, break3_end]
-                            valid = True
-                            for field in time_fields:
-                                if field:
-                                    try:
-                                        datetime.strptime(f"{edit_date} {field}", "%Y-%m-%d %I:%M %p")
-                                    except ValueError:
-                                        st.error(f"❌ INVALID TIME FORMAT: {field}. Use HH:MM AM/PM (e.g., 04:00 PM).")
-                                        valid = False
-                            if valid:
-                                df.at[session_index, 'CheckIn'] = check_in if check_in else pd.NA
-                                df.at[session_index, 'CheckOut'] = check_out if check_out else pd.NA
-                                df.at[session_index, 'Break1Start'] = break1_start if break1_start else pd.NA
-                                df.at[session_index, 'Break1End'] = break1_end if break1_end else pd.NA
-                                df.at[session_index, 'Break2Start'] = break2_start if break2_start else pd.NA
-                                df.at[session_index, 'Break2End'] = break2_end if break2_end else pd.NA
-                                df.at[session_index, 'Break3Start'] = break3_start if break3_start else pd.NA
-                                df.at[session_index, 'Break3End'] = break3_end if break3_end else pd.NA
-                                df.at[session_index, 'Active'] = active
-                                total_hours, break_duration = calculate_times(df.loc[session_index], edit_date)
-                                df.at[session_index, 'TotalHours'] = total_hours
-                                df.at[session_index, 'BreakDuration'] = break_duration
-                                # Ensure time columns remain strings
-                                for col in TIME_COLUMNS:
-                                    df[col] = df[col].astype("string").fillna(pd.NA)
-                                save_data()
+                            # One parse for all the filled-in fields; only the failures are reported
+                            entered = pd.Series([field for field in time_fields if field], dtype=object)
+                            invalid = entered[pd.to_datetime(entered, format="%I:%M %p", errors='coerce').isna()]
+                            for field in invalid:
+                                st.error(f"❌ INVALID TIME FORMAT: {field}. Use HH:MM AM/PM (e.g., 04:00 PM).")
+                            if invalid.empty:
+                                # One multi-column write instead of a df.at dispatch per field
+                                times = dict(zip(TIME_COLUMNS, [field or pd.NA for field in time_fields]))
+                                df.loc[session_index, TIME_COLUMNS + ['Active', 'TotalHours', 'BreakDuration']] = [
+                                    *times.values(), active, *calculate_times(times)
+                                ]
+                                save_rows([session_index])
                                 st.success(f"✅ SESSION FOR {edit_user} ON {edit_date} UPDATED!")
                                 st.session_state.last_action = f"Session for {edit_user} updated"
                                 st.rerun()
         
         with tab3:
             st.markdown("<h4 style='color: var(--accent-glow);'>REMOVE USER</h4>", unsafe_allow_html=True)
-            remove_user = st.selectbox("SELECT USER TO REMOVE", options=['None'] + sorted(df['User'].unique().tolist()), key='remove_user')
+            remove_user = st.selectbox("SELECT USER TO REMOVE", options=['None'] + LOOKUPS['users'], key='remove_user')
             action = st.selectbox("ACTION", options=["Keep User", "Delete User (Keep Data)", "Delete User and Data"], key='user_action')
             
             if st.button("⚡ EXECUTE ACTION", use_container_width=True) and remove_user != 'None':
-                user_records = df[df['User'] == remove_user]
-                if user_records.empty:
+                user_index = df.index[LOOKUPS['user_rows'].get(remove_user, [])]
+                if user_index.empty:
                     st.error(f"❌ USER {remove_user} NOT FOUND")
                 else:
                     if action == "Delete User (Keep Data)":
-                        df.loc[df['User'] == remove_user, 'Active'] = False
-                        save_data()
+                        df.loc[user_index, 'Active'] = False
+                        save_rows(user_index)
                         st.success(f"✅ USER {remove_user} DELETED. HISTORICAL DATA RETAINED.")
                     elif action == "Delete User and Data":
-                        df = df[df['User'] != remove_user]
+                        df = df.drop(index=user_index).reset_index(drop=True)
                         save_data()
                         st.success(f"✅ USER {remove_user} AND ALL ASSOCIATED DATA DELETED.")
                     st.session_state.last_action = f"User {remove_user} {action.lower()}"
@@ -965,18 +816,6 @@ elif selected == "⚙️ COMMAND CENTER":
         st.markdown("<div class='cyber-card'>", unsafe_allow_html=True)
         st.markdown("<h3 style='color: var(--primary-glow);'>📤 DATA EXPORT</h3>", unsafe_allow_html=True)
         
-        def get_excel_download_link(df):
-            df_download = df.copy()
-            df_download['Date'] = df_download['Date'].apply(
-                lambda x: x.strftime('%Y-%m-%d') if pd.notna(x) and hasattr(x, 'strftime') else str(x) if pd.notna(x) else ''
-            )
-            with pd.ExcelWriter('attendance.xlsx', engine='xlsxwriter') as writer:
-                df_download.to_excel(writer, index=False, sheet_name='DataMatrix')
-            with open('attendance.xlsx', 'rb') as f:
-                data = f.read()
-            b64 = base64.b64encode(data).decode()
-            return f'<a href="data:application/octet-stream;base64,{b64}" download="attendance.xlsx" style="display: inline-block; padding: 0.5rem 1rem; background: linear-gradient(135deg, rgba(0, 242, 255, 0.2), rgba(255, 0, 255, 0.2)); border: 1px solid var(--cyber-border); border-radius: 5px; color: var(--text-neon); text-decoration: none; font-family: Exo 2, sans-serif; font-weight: 600;">📥 DOWNLOAD DATA MATRIX</a>'
-        
         st.markdown(get_excel_download_link(df), unsafe_allow_html=True)
         st.markdown("</div>", unsafe_allow_html=True)
         
@@ -990,7 +829,7 @@ if st.session_state.last_action:
     st.session_state.last_action = None
 
 # Add real-time clock
-current_time = datetime.now(EGYPT_TZ).strftime("%Y-%m-%d %H:%M:%S")
+current_time = NOW.strftime("%Y-%m-%d %H:%M:%S")
 st.sidebar.markdown(f"""
     <div class='cyber-card' style='text-align: center;'>
         <div style='font-size: 0.9rem; color: var(--primary-glow);'>QUANTUM TIME</div>